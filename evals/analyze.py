@@ -227,7 +227,7 @@ def main():
         for key, stats in sorted(speed_analysis.items()):
             print(f"{key}:")
             print(f"  Avg execution time: {stats['avg_execution_time']:.3f}s")
-            print(f"  Avg summary length: {stats['avg_summary_length']:.1f} chars")
+            print(f"  Avg summary length: {stats['avg_summary_length']:.1f} bytes")
         
         print("\n=== Quality Analysis ===")
         for key, stats in sorted(quality_analysis.items()):
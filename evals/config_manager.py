@@ -5,13 +5,13 @@ Configuration manager for evaluation config files.
 Generates and manages config files for different models from templates.
 """
 
-import json
-import shutil
+import os
 from pathlib import Path
+from string import Template
 from typing import Dict, Optional
 import sys
 
-# Default config template
+# Default config template (string.Template syntax)
 DEFAULT_CONFIG_TEMPLATE = """# Number of days to keep temporary output files before cleaning them up
 clean_up_days = 5
 
@@ -20,22 +20,22 @@ command_context_minutes = 0
 
 # The provider to use for the summary generation
 [provider]
-type = "{provider_type}"
-url = "{provider_url}"
-model = "{model_name}"
+type = "${provider_type}"
+url = "${provider_url}"
+model = "${model_name}"
 
 prompt = \"\"\"
 You are a command output analyzer that provides concise, actionable summaries for AI agents.
 
-${{recent_commands}}
+$${recent_commands}
 
-Command executed: ${{command}}
-Exit code: ${{exit_code}}
+Command executed: $${command}
+Exit code: $${exit_code}
 Output:
 
-${{output}}
+$${output}
 
-Generate a summary in ${{summary_words}} words or less following these guidelines:
+Generate a summary in $${summary_words} words or less following these guidelines:
 
 1. PRIORITIZE ACTIONABLE INFORMATION:
    - If the command failed, identify the root cause and suggest specific fixes
@@ -64,15 +64,21 @@ Generate a summary in ${{summary_words}} words or less following these guideline
 Remember: This summary will help an AI agent decide whether to investigate the full output file or proceed with the next task.
 \"\"\"
 
-summary_words = {summary_words}
-output_length_threshold = {output_length_threshold}
+summary_words = ${summary_words}
+output_length_threshold = ${output_length_threshold}
 
 # Per-command configuration
 [commands]
 """
 
+# Parsed once at import; $$ escapes the ${...} placeholders cg fills in itself
+_CONFIG_TEMPLATE = Template(DEFAULT_CONFIG_TEMPLATE)
+
 def load_model_configs(config_path: Path) -> Dict:
     """Load model configurations from JSON file."""
+    # Imported here so commands that never parse JSON (list, validate) skip it
+    import json
+    
     with open(config_path, 'r') as f:
         return json.load(f)
 
@@ -90,7 +96,7 @@ def generate_config_file(
     if output_length_threshold is None:
         output_length_threshold = summary_words
 
-    config_content = DEFAULT_CONFIG_TEMPLATE.format(
+    config_content = _CONFIG_TEMPLATE.substitute(
         provider_type=provider_type,
         provider_url=provider_url,
         model_name=model_name,
@@ -99,8 +105,7 @@ def generate_config_file(
     )
     
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, 'w') as f:
-        f.write(config_content)
+    output_path.write_text(config_content, encoding='utf-8')
     
     print(f"Generated config file: {output_path}")
 
@@ -138,18 +143,16 @@ def validate_config_file(config_path: Path) -> bool:
     Validate that a config file exists and is readable.
     Returns True if valid, False otherwise.
     """
-    if not config_path.exists():
-        print(f"Error: Config file does not exist: {config_path}")
-        return False
-    
     try:
         # Try to read the file
-        with open(config_path, 'r') as f:
-            content = f.read()
-            # Basic validation: check for required sections
-            if "[provider]" not in content:
-                print(f"Error: Config file missing [provider] section: {config_path}")
-                return False
+        content = config_path.read_text(encoding='utf-8')
+        # Basic validation: check for required sections
+        if "[provider]" not in content:
+            print(f"Error: Config file missing [provider] section: {config_path}")
+            return False
+    except FileNotFoundError:
+        print(f"Error: Config file does not exist: {config_path}")
+        return False
     except Exception as e:
         print(f"Error reading config file {config_path}: {e}")
         return False
@@ -162,7 +165,11 @@ def list_configs(configs_dir: Path) -> None:
         print(f"Configs directory does not exist: {configs_dir}")
         return
     
-    config_files = sorted(configs_dir.glob("*.toml"))
+    # scandir reports file type from the directory listing, avoiding a stat per entry
+    config_files = sorted(
+        entry.name for entry in os.scandir(configs_dir)
+        if entry.is_file() and entry.name.endswith(".toml")
+    )
     
     if not config_files:
         print(f"No config files found in {configs_dir}")
@@ -170,7 +177,7 @@ def list_configs(configs_dir: Path) -> None:
     
     print(f"Found {len(config_files)} config file(s):")
     for config_file in config_files:
-        print(f"  - {config_file.name}")
+        print(f"  - {config_file}")
 
 def main():
     """Main entry point."""
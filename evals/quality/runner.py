@@ -7,17 +7,43 @@ Tests whether summaries contain enough information for an agent to solve challen
 
 import json
 import os
+import queue
+import re
 import shlex
 import subprocess
 import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # Optional: fall back to plain substring checks
+    ahocorasick = None
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from runner_common import (
+    cancel_pending, cg_supports_force_summary, config_available, finish_result_writer,
+    list_config_names, report_force_summary_support, start_result_writer,
+)
+
 TIMEOUT_SECONDS = 300
+DEFAULT_PARALLELISM = 8
+# Portions of cg's stdout read back: the head holds the summary, the tail the output path
+OUTPUT_HEAD_BYTES = 1 << 16
+OUTPUT_TAIL_BYTES = 4096
+RESULT_HEADER = ["model", "config_file", "challenge", "can_solve", "needs_full_output",
+                 "quality_score", "exit_code", "summary"]
+# e.g. "The complete output is available at /path/to/file, prefer reading ..."
+_OUTPUT_FILE_RE = re.compile(
+    r"complete output is available at\s+(.+?)(?:, prefer reading|\s*$)", re.MULTILINE
+)
+_RAW_OUTPUT_RE = re.compile(r"output shorter than.+?returning raw output", re.IGNORECASE | re.DOTALL)
 
 def load_config(config_path: Path) -> Dict:
     """Load evaluation configuration from JSON file."""
@@ -29,6 +55,42 @@ def load_challenge(challenge_path: Path) -> Dict:
     with open(challenge_path, 'r') as f:
         return json.load(f)
 
+def prepare_challenge(name: str, challenge: Dict) -> Dict:
+    """
+    Preprocess a challenge once for repeated evaluation.
+    Expected issue, solution and key phrases are lowercased up front.
+    """
+    issue_lc = challenge.get("expected_issue", "").lower()
+    solution_lc = challenge.get("expected_solution", "").lower()
+    phrases_lc = [p.lower() for p in challenge.get("key_phrases", [])]
+    return {
+        "name": name,
+        "command": challenge.get("command", ""),
+        "issue_lc": issue_lc,
+        "solution_lc": solution_lc,
+        "phrases_lc": phrases_lc,
+        "matcher": build_phrase_matcher([issue_lc, solution_lc] + phrases_lc),
+        # Held while the command runs so one challenge never runs twice at once
+        "lock": threading.Lock(),
+    }
+
+def build_phrase_matcher(phrases: List[str]):
+    """
+    Build an Aho-Corasick automaton over the non-empty phrases.
+    Returns None when pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for phrase in phrases:
+        if phrase:
+            automaton.add_word(phrase, phrase)
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
 def run_command(
     config_file: str,
     command: str,
@@ -38,69 +100,83 @@ def run_command(
 ) -> Tuple[str, int, Optional[str], bool]:
     """
     Run a command with cg and capture output.
-    Returns: (stdout, exit_code, output_file_path, used_raw_output)
+    stdout is streamed to a temporary file and only its head and tail are read back.
+    Returns: (stdout_head, exit_code, output_file_path, used_raw_output)
     """
-    def execute(use_force: bool) -> Tuple[str, str, int]:
-        force_flag = "--force-summary" if use_force else ""
-        cg_command = f"cg -c {shlex.quote(config_file)} {force_flag} {command}".strip()
-        result = subprocess.run(
-            ["sh", "-c", cg_command],
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            timeout=timeout,
-        )
-        return result.stdout, result.stderr, result.returncode
-
-    try:
-        stdout, stderr, exit_code = execute(force_summary)
-    except subprocess.TimeoutExpired as e:
-        stdout = (e.stdout or "") + "\n" + (e.stderr or "")
-        stderr = ""
-        exit_code = 124
+    force_flag = ["--force-summary"] if force_summary and cg_supports_force_summary() else []
+    argv = ["cg", "-c", config_file] + force_flag + shlex.split(command)
 
-    # Retry without --force-summary if the installed cg doesn't support it
-    if exit_code != 0 and force_summary:
-        combined = f"{stdout}\n{stderr}".lower()
-        if "unexpected argument '--force-summary'" in combined or "--force-summary" in combined:
-            print("  Info: --force-summary not supported by cg, retrying without it.")
-            stdout, stderr, exit_code = execute(False)
+    with tempfile.TemporaryFile() as out:
+        try:
+            result = subprocess.run(
+                argv,
+                stdout=out,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                timeout=timeout,
+            )
+            stdout, tail = _read_output_head_and_tail(out)
+            exit_code = result.returncode
+        except subprocess.TimeoutExpired as e:
+            stdout, tail = _read_output_head_and_tail(out)
+            stdout += "\n" + (e.stderr or b"").decode("utf-8", errors="replace")
+            exit_code = 124
 
-    # Extract output file path from stdout
-    output_file = None
-    for line in stdout.split('\n'):
-        if 'complete output is available at' in line:
-            # Extract path from line like "The complete output is available at /path/to/file"
-            parts = line.split('available at ')
-            if len(parts) > 1:
-                output_file = parts[1].strip()
-            break
+    # Extract output file path from the end of stdout, where cg prints it
+    match = _OUTPUT_FILE_RE.search(tail)
+    output_file = match.group(1) if match else None
 
     # Detect when cg skipped summarization and returned raw output
-    summary_lower = stdout.lower()
-    used_raw_output = "output shorter than" in summary_lower and "returning raw output" in summary_lower
+    used_raw_output = bool(_RAW_OUTPUT_RE.search(stdout))
 
     return stdout, exit_code, output_file, used_raw_output
 
+def _read_output_head_and_tail(handle) -> Tuple[str, str]:
+    """
+    Read the first OUTPUT_HEAD_BYTES and last OUTPUT_TAIL_BYTES of captured output.
+    Returns: (head, tail); both are the whole output when it fits in the head.
+    """
+    size = handle.seek(0, os.SEEK_END)
+    handle.seek(0)
+    head = handle.read(OUTPUT_HEAD_BYTES)
+    if size <= OUTPUT_HEAD_BYTES:
+        tail = head
+    else:
+        # Overlapping the head is fine; a gap could split the output path line
+        handle.seek(max(0, size - OUTPUT_TAIL_BYTES))
+        tail = handle.read()
+    return head.decode("utf-8", errors="replace"), tail.decode("utf-8", errors="replace")
+
 def evaluate_summary_quality(summary: str, challenge: Dict) -> Dict:
     """
     Evaluate whether the summary contains key information needed to solve the challenge.
+    Expects a challenge preprocessed by prepare_challenge.
     Returns a dict with evaluation metrics.
     """
-    expected_issue = challenge.get("expected_issue", "").lower()
-    expected_solution = challenge.get("expected_solution", "").lower()
-    key_phrases = challenge.get("key_phrases", [])
+    expected_issue = challenge["issue_lc"]
+    expected_solution = challenge["solution_lc"]
+    key_phrases = challenge["phrases_lc"]
     
     summary_lower = summary.lower()
     
+    # Collect every expected phrase that occurs in the summary in one pass
+    matcher = challenge["matcher"]
+    if matcher is not None:
+        found = {phrase for _, phrase in matcher.iter(summary_lower)}
+    else:
+        found = {
+            phrase for phrase in [expected_issue, expected_solution] + key_phrases
+            if phrase and phrase in summary_lower
+        }
+    
     # Check if summary mentions the expected issue
-    issue_found = expected_issue in summary_lower if expected_issue else True
+    issue_found = expected_issue in found if expected_issue else True
     
     # Check if summary mentions the expected solution
-    solution_found = expected_solution in summary_lower if expected_solution else True
+    solution_found = expected_solution in found if expected_solution else True
     
     # Check for key phrases
-    phrases_found = sum(1 for phrase in key_phrases if phrase.lower() in summary_lower)
+    phrases_found = sum(1 for phrase in key_phrases if not phrase or phrase in found)
     phrase_coverage = phrases_found / len(key_phrases) if key_phrases else 1.0
     
     # Overall quality score (0-1)
@@ -124,18 +200,84 @@ def evaluate_summary_quality(summary: str, challenge: Dict) -> Dict:
         "total_phrases": len(key_phrases)
     }
 
-def write_result_file(result_path: Path, model: str, config_file: str,
-                     challenge_name: str, can_solve: bool, needs_full_output: bool,
-                     quality_score: float, summary: str, exit_code: int) -> None:
-    """Write evaluation result to CSV file."""
-    summary_clean = summary.replace('\n', ' ').replace(',', ';')[:500]
+def format_result_row(model: str, config_file: str,
+                      challenge_name: str, can_solve: bool, needs_full_output: bool,
+                      quality_score: float, summary: str, exit_code: int) -> Tuple:
+    """Format an evaluation result as a row of the results CSV."""
+    return (model, config_file, challenge_name, can_solve,
+            needs_full_output, f"{quality_score:.3f}", exit_code, summary[:500])
+
+def iter_tasks(models: Dict, configs_dir: Path, available_configs: Set[str],
+               challenges: List[Dict]) -> Iterator[Tuple[str, str, Path, Dict]]:
+    """
+    Yield every (model, config, challenge) combination to evaluate.
+    Configs that do not exist (see config_available) are skipped.
+    Yields: (model_name, config_file, config_path_full, challenge)
+    """
+    for model_name, model_config in models.items():
+        config_files = model_config.get("config_files", [])
+        
+        if not config_files:
+            print(f"Warning: No config files specified for model {model_name}, skipping.")
+            continue
+        
+        for config_file in config_files:
+            config_path_full = configs_dir / config_file
+            if not config_available(config_file, config_path_full, available_configs):
+                print(f"Warning: Config file {config_path_full} does not exist, skipping.")
+                continue
+            
+            for challenge in challenges:
+                yield model_name, config_file, config_path_full, challenge
+
+def evaluate_challenge(model_name: str, config_file: str, config_path_full: Path,
+                       challenge: Dict, repo_root: Path, results_q: queue.Queue) -> str:
+    """
+    Run a single challenge for a model/config pair and record the result.
+    Returns a one-line status message for progress output.
+    """
+    # Run the command; concurrent runs of the same command would contend for
+    # shared build dirs and write the same cg output file
+    with challenge["lock"]:
+        stdout, exit_code, output_file, used_raw_output = run_command(
+            str(config_path_full),
+            challenge["command"],
+            cwd=repo_root,
+            force_summary=True,
+        )
+    
+    # Evaluate summary quality (treat raw-output responses as insufficient)
+    if used_raw_output:
+        evaluation = {
+            "can_solve": False,
+            "quality_score": 0.0,
+            "issue_found": False,
+            "solution_found": False,
+            "phrase_coverage": 0.0,
+            "phrases_found": 0,
+            "total_phrases": len(challenge["phrases_lc"]),
+        }
+        needs_full_output = True
+    else:
+        evaluation = evaluate_summary_quality(stdout, challenge)
+        # For now, assume full output is needed if quality_score < 0.5
+        needs_full_output = evaluation["quality_score"] < 0.5
     
-    with open(result_path, 'a') as f:
-        f.write(f"{model},{config_file},{challenge_name},{can_solve},"
-                f"{needs_full_output},{quality_score:.3f},{exit_code},{summary_clean}\n")
+    # Hand the result to the writer thread
+    results_q.put(format_result_row(
+        model_name, config_file, challenge["name"],
+        evaluation["can_solve"], needs_full_output,
+        evaluation["quality_score"], stdout, exit_code
+    ))
+    
+    return (f"Quality: {evaluation['quality_score']:.2f}, "
+            f"Can solve: {evaluation['can_solve']}")
 
-def run_quality_evaluation(config_path: Path, results_dir: Path) -> None:
-    """Run quality evaluation for all models, configurations, and challenges."""
+def run_quality_evaluation(config_path: Path, results_dir: Path) -> bool:
+    """
+    Run quality evaluation for all models, configurations, and challenges.
+    Returns False if any result could not be written to the results file.
+    """
     config = load_config(config_path)
     
     # Create results directory if it doesn't exist
@@ -148,94 +290,84 @@ def run_quality_evaluation(config_path: Path, results_dir: Path) -> None:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     result_file = results_dir / f"quality_{timestamp}.csv"
     
-    # Write CSV header
-    with open(result_file, 'w') as f:
-        f.write("model,config_file,challenge,can_solve,needs_full_output,"
-                "quality_score,exit_code,summary\n")
-    
     models = config.get("models", {})
+    parallelism = config.get("parallelism", DEFAULT_PARALLELISM)
     challenges_dir = Path(__file__).parent / "challenges"
     configs_dir = Path(__file__).parent.parent / "configs"
     
     # Get list of challenges
-    challenge_files = sorted(challenges_dir.glob("*.json"))
+    # scandir reports file type from the directory listing, avoiding a stat per entry
+    try:
+        challenge_files = sorted(
+            Path(entry.path) for entry in os.scandir(challenges_dir)
+            if entry.is_file() and entry.name.endswith(".json")
+        )
+    except FileNotFoundError:
+        challenge_files = []
     
     if not challenge_files:
         print(f"Warning: No challenge files found in {challenges_dir}")
-        return
+        return True
+    
+    available_configs = list_config_names(configs_dir)
+    
+    # Load every challenge once up front; they are shared by all models and configs
+    challenges = []
+    for challenge_file in challenge_files:
+        try:
+            challenge = load_challenge(challenge_file)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load challenge {challenge_file.stem}: {e}, skipping.")
+            continue
+        if not challenge.get("command", ""):
+            print(f"Warning: Challenge {challenge_file.stem} has no command, skipping.")
+            continue
+        challenges.append(prepare_challenge(challenge_file.stem, challenge))
     
     print(f"Starting quality evaluation...")
     print(f"Results will be written to: {result_file}")
     print(f"Models: {list(models.keys())}")
-    print(f"Challenges: {[c.stem for c in challenge_files]}")
+    print(f"Challenges: {[c['name'] for c in challenges]}")
+    print(f"Parallelism: {parallelism}")
     print()
     
-    for model_name, model_config in models.items():
-        config_files = model_config.get("config_files", [])
-        
-        if not config_files:
-            print(f"Warning: No config files specified for model {model_name}, skipping.")
-            continue
-        
-        for config_file in config_files:
-            config_path_full = configs_dir / config_file
-            if not config_path_full.exists():
-                print(f"Warning: Config file {config_path_full} does not exist, skipping.")
-                continue
-            
-            print(f"Evaluating {model_name} with config {config_file}...")
-            
-            for challenge_file in challenge_files:
-                challenge = load_challenge(challenge_file)
-                challenge_name = challenge_file.stem
-                command = challenge.get("command", "")
-                
-                if not command:
-                    print(f"  Warning: Challenge {challenge_name} has no command, skipping.")
-                    continue
-                
-                print(f"  Challenge: {challenge_name}...", end=" ", flush=True)
-                
-                try:
-                    # Run the command
-                    stdout, exit_code, output_file, used_raw_output = run_command(
-                        str(config_path_full),
-                        command,
-                        cwd=repo_root,
-                        force_summary=True,
-                    )
-                    
-                    # Evaluate summary quality (treat raw-output responses as insufficient)
-                    if used_raw_output:
-                        evaluation = {
-                            "can_solve": False,
-                            "quality_score": 0.0,
-                            "issue_found": False,
-                            "solution_found": False,
-                            "phrase_coverage": 0.0,
-                            "phrases_found": 0,
-                            "total_phrases": len(challenge.get("key_phrases", [])),
-                        }
-                        needs_full_output = True
-                    else:
-                        evaluation = evaluate_summary_quality(stdout, challenge)
-                        # For now, assume full output is needed if quality_score < 0.5
-                        needs_full_output = evaluation["quality_score"] < 0.5
-                    
-                    print(f"Quality: {evaluation['quality_score']:.2f}, "
-                          f"Can solve: {evaluation['can_solve']}")
-                    
-                    # Write result
-                    write_result_file(
-                        result_file, model_name, config_file, challenge_name,
-                        evaluation["can_solve"], needs_full_output,
-                        evaluation["quality_score"], stdout, exit_code
+    report_force_summary_support()
+    
+    # Each cg invocation is independent and I/O bound, so threads are enough
+    results_q, writer_thread, write_failures = start_result_writer(result_file, RESULT_HEADER)
+    try:
+        # Each challenge runs one task at a time, so extra workers would only wait
+        workers = max(1, min(parallelism, len(challenges)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            try:
+                for model_name, config_file, config_path_full, challenge in iter_tasks(
+                    models, configs_dir, available_configs, challenges
+                ):
+                    future = executor.submit(
+                        evaluate_challenge, model_name, config_file, config_path_full,
+                        challenge, repo_root, results_q,
                     )
-                    
-                except Exception as e:
-                    print(f"ERROR: {e}")
+                    futures[future] = (model_name, config_file, challenge["name"])
+                
+                for future in as_completed(futures):
+                    model_name, config_file, challenge_name = futures[future]
+                    try:
+                        message = future.result()
+                    except Exception as e:
+                        message = f"ERROR: {e}"
+                    print(f"  {model_name} / {config_file} / {challenge_name}: {message}")
+            except BaseException:
+                cancel_pending(futures)
+                raise
+    finally:
+        written = finish_result_writer(results_q, writer_thread, write_failures, result_file)
+    
+    if not written:
+        return False
     
     print(f"\nEvaluation complete. Results saved to: {result_file}")
+    return True
 
 def main():
     """Main entry point."""
@@ -261,12 +393,14 @@ def main():
     "model-name": {
       "config_files": ["model-name.toml"]
     }
-  }
+  },
+  "parallelism": 8
 }
 """)
         sys.exit(1)
     
-    run_quality_evaluation(config_path, results_dir)
+    if not run_quality_evaluation(config_path, results_dir):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
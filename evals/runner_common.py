@@ -0,0 +1,125 @@
+"""
+Shared helpers for the speed and quality evaluation runners.
+
+Covers probing the installed cg, scanning config files, cancelling queued
+tasks and writing result rows to CSV from a dedicated thread.
+"""
+
+import csv
+import functools
+import os
+import queue
+import subprocess
+import threading
+from pathlib import Path
+from typing import Iterable, List, Set, Tuple
+
+RESULT_BUFFER_SIZE = 1 << 16
+RESULT_FLUSH_EVERY = 16
+
+@functools.lru_cache(maxsize=1)
+def cg_supports_force_summary() -> bool:
+    """Check once per process whether the installed cg accepts --force-summary."""
+    try:
+        result = subprocess.run(["cg", "--help"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return "--force-summary" in result.stdout
+
+def report_force_summary_support() -> None:
+    """Probe cg before any worker starts so the check runs exactly once."""
+    if not cg_supports_force_summary():
+        print("Info: --force-summary not supported by cg, running without it.")
+
+def list_config_names(configs_dir: Path) -> Set[str]:
+    """Return the config file names in configs_dir using a single directory scan."""
+    try:
+        return {entry.name for entry in os.scandir(configs_dir) if entry.is_file()}
+    except FileNotFoundError:
+        return set()
+
+def config_available(config_file: str, config_path: Path, available_configs: Set[str]) -> bool:
+    """
+    Check whether a configured config file exists.
+    Bare names use the directory scan; entries with a subdirectory or absolute path hit the disk.
+    """
+    if os.path.basename(config_file) == config_file:
+        return config_file in available_configs
+    return config_path.is_file()
+
+def cancel_pending(futures: Iterable) -> None:
+    """Cancel queued futures so executor shutdown only waits for running ones."""
+    for future in futures:
+        future.cancel()
+
+def _describe_row(row: Tuple) -> str:
+    """Identify a result row by its first three fields for error messages."""
+    return " / ".join(str(value) for value in row[:3])
+
+def _drain_to_csv(results_q: queue.Queue, result_file: Path, header: List[str],
+                  failures: List[str]) -> None:
+    """
+    Write rows from results_q to result_file until a None sentinel arrives.
+    Rows that cannot be written are recorded in failures and the rest are kept.
+    """
+    finished = False
+    try:
+        with open(result_file, 'w', newline='', encoding='utf-8',
+                  buffering=RESULT_BUFFER_SIZE) as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            pending = 0
+            while True:
+                row = results_q.get()
+                if row is None:
+                    finished = True
+                    break
+                try:
+                    writer.writerow(row)
+                except Exception as e:
+                    failures.append(f"{_describe_row(row)}: {e}")
+                    continue
+                pending += 1
+                # Flush in batches, or as soon as the queue runs dry
+                if pending >= RESULT_FLUSH_EVERY or results_q.empty():
+                    f.flush()
+                    pending = 0
+    except Exception as e:
+        failures.append(f"{result_file}: {e}")
+
+    # The file is unusable; keep consuming so every lost row is reported
+    while not finished:
+        row = results_q.get()
+        if row is None:
+            break
+        failures.append(f"{_describe_row(row)}: results file unavailable")
+
+def start_result_writer(result_file: Path,
+                        header: List[str]) -> Tuple[queue.Queue, threading.Thread, List[str]]:
+    """
+    Start a thread that owns result_file; workers put result rows on the queue.
+    Returns: (results_queue, writer_thread, write_failures)
+    """
+    results_q = queue.Queue()
+    failures = []
+    writer_thread = threading.Thread(
+        target=_drain_to_csv, args=(results_q, result_file, header, failures)
+    )
+    writer_thread.start()
+    return results_q, writer_thread, failures
+
+def finish_result_writer(results_q: queue.Queue, writer_thread: threading.Thread,
+                         failures: List[str], result_file: Path) -> bool:
+    """
+    Stop the writer thread and report any rows it could not write.
+    Returns True if every row was written.
+    """
+    results_q.put(None)
+    writer_thread.join()
+
+    if failures:
+        print(f"\nERROR: {len(failures)} result(s) could not be written to {result_file}:")
+        for failure in failures:
+            print(f"  {failure}")
+        return False
+    return True
@@ -6,37 +6,76 @@ Measures execution time for different models and configurations across
 various output sizes.
 """
 
+import atexit
+import functools
 import json
 import os
+import queue
 import shlex
 import subprocess
 import sys
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Optional, Tuple
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from runner_common import (
+    cancel_pending, cg_supports_force_summary, config_available, finish_result_writer,
+    list_config_names, report_force_summary_support, start_result_writer,
+)
+
 def load_config(config_path: Path) -> Dict:
     """Load evaluation configuration from JSON file."""
     with open(config_path, 'r') as f:
         return json.load(f)
 
-def write_test_file(max_tokens: int, size_factor: float) -> str:
+TEST_FILE_BLOCK = b"a" * (1 << 16)
+
+def _remove_test_file(path: str) -> None:
+    """Delete a generated test file, ignoring files that are already gone."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+@functools.lru_cache(maxsize=None)
+def get_test_file(size: int) -> str:
     """
-    Write a test file of the given size to the temporary directory.
-    Size is calculated as size_factor * max_tokens characters.
+    Return the path of a test file of `size` characters, writing it on first use.
+    Files are shared across models and configs and removed when the process exits.
     """
-    size = int(size_factor * max_tokens)
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt') as f:
-        f.write("a" * size)
-    return f.name
+    # Negative sizes produce an empty file, as "a" * size would
+    size = max(size, 0)
+    fd, path = tempfile.mkstemp(suffix='.txt')
+    atexit.register(_remove_test_file, path)
+    try:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                # Not every filesystem supports preallocation
+                pass
+        # Write a fixed block repeatedly rather than building a size-byte string
+        block = memoryview(TEST_FILE_BLOCK)
+        remaining = size
+        while remaining > 0:
+            remaining -= os.write(fd, block[:remaining])
+    finally:
+        os.close(fd)
+    return path
 
 TIMEOUT_SECONDS = 300
-
+# Run one task at a time by default so timings aren't skewed by contention
+DEFAULT_PARALLELISM = 1
+# Only the start of cg's stdout is kept; the CSV stores at most 500 characters
+OUTPUT_HEAD_BYTES = 2048
+RESULT_HEADER = ["model", "config_file", "size_factor", "execution_time",
+                 "summary_length", "exit_code", "summary"]
 
 def run_command(
     config_file: str,
@@ -44,60 +83,91 @@ def run_command(
     cwd: Path,
     timeout: int = TIMEOUT_SECONDS,
     force_summary: bool = True,
-) -> Tuple[float, str, int]:
+) -> Tuple[float, str, int, int]:
     """
     Run a command with cg and measure execution time.
-    Returns: (execution_time, stdout, exit_code)
+    stdout is streamed to a temporary file and only its head is read back.
+    Returns: (execution_time, stdout_head, stdout_length_in_bytes, exit_code)
     """
-    def execute(use_force: bool) -> subprocess.CompletedProcess:
-        force_flag = "--force-summary" if use_force else ""
-        cg_command = f"cg -c {shlex.quote(config_file)} {force_flag} {command}".strip()
-        return subprocess.run(
-            ["sh", "-c", cg_command],
-            capture_output=True,
-            text=True,
-            cwd=cwd,
-            timeout=timeout,
-        )
-
-    start_time = time.time()
-    try:
-        result = execute(force_summary)
-    except subprocess.TimeoutExpired as e:
+    force_flag = ["--force-summary"] if force_summary and cg_supports_force_summary() else []
+    argv = ["cg", "-c", config_file] + force_flag + shlex.split(command)
+
+    with tempfile.TemporaryFile() as out:
+        start_time = time.time()
+        try:
+            result = subprocess.run(
+                argv,
+                stdout=out,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            end_time = time.time()
+            execution_time = end_time - start_time
+            stdout, _ = _read_output_head(out)
+            stderr = (e.stderr or b"").decode("utf-8", errors="replace")
+            message = (
+                f"Command timed out after {timeout}s. stdout: {stdout} stderr: {stderr}"
+            )
+            # Report bytes like the normal path, which measures the output file
+            return execution_time, message, len(message.encode("utf-8")), 124
+
         end_time = time.time()
         execution_time = end_time - start_time
-        stdout = e.stdout or ""
-        stderr = e.stderr or ""
-        message = (
-            f"Command timed out after {timeout}s. stdout: {stdout} stderr: {stderr}"
-        )
-        return execution_time, message, 124
-
-    # Retry without --force-summary if the installed cg doesn't support it
-    if result.returncode != 0 and force_summary:
-        combined = f"{result.stdout}\n{result.stderr}".lower()
-        if "unexpected argument '--force-summary'" in combined or "--force-summary" in combined:
-            print("  Info: --force-summary not supported by cg, retrying without it.")
-            result = execute(False)
-
-    end_time = time.time()
-    execution_time = end_time - start_time
-    return execution_time, result.stdout, result.returncode
-
-def write_result_file(result_path: Path, model: str, config_file: str, 
-                     size_factor: float, execution_time: float, 
-                     summary: str, exit_code: int) -> None:
-    """Write evaluation result to CSV file."""
-    # Clean summary for CSV (remove newlines, limit length)
-    summary_clean = summary.replace('\n', ' ').replace(',', ';')[:500]
-    summary_length = len(summary)
-    
-    with open(result_path, 'a') as f:
-        f.write(f"{model},{config_file},{size_factor},{execution_time:.3f},"
-                f"{summary_length},{exit_code},{summary_clean}\n")
-
-def run_speed_evaluation(config_path: Path, results_dir: Path) -> None:
-    """Run speed evaluation for all models and configurations."""
+        stdout, stdout_length = _read_output_head(out)
+    return execution_time, stdout, stdout_length, result.returncode
+
+def _read_output_head(handle) -> Tuple[str, int]:
+    """
+    Read the first OUTPUT_HEAD_BYTES of captured output.
+    Returns: (head, total_size_in_bytes)
+    """
+    size = handle.seek(0, os.SEEK_END)
+    handle.seek(0)
+    head = handle.read(OUTPUT_HEAD_BYTES)
+    return head.decode("utf-8", errors="replace"), size
+
+def format_result_row(model: str, config_file: str,
+                      size_factor: float, execution_time: float,
+                      summary: str, summary_length: int, exit_code: int) -> Tuple:
+    """Format an evaluation result as a row of the results CSV."""
+    return (model, config_file, size_factor, f"{execution_time:.3f}",
+            summary_length, exit_code, summary[:500])
+
+def measure_size_factor(model_name: str, config_file: str, config_path_full: Path,
+                        size_factor: float, test_file: str, repo_root: Path,
+                        results_q: queue.Queue) -> str:
+    """
+    Time a single cg invocation for one size factor and record the result.
+    Returns a one-line status message for progress output.
+    """
+    file_size = os.path.getsize(test_file)
+    
+    # Run command
+    exec_time, stdout, stdout_length, exit_code = run_command(
+        str(config_path_full),
+        f"cat {shlex.quote(test_file)}",
+        cwd=repo_root,
+        force_summary=True,
+    )
+    
+    # Hand the result to the writer thread
+    results_q.put(format_result_row(
+        model_name, config_file, size_factor,
+        exec_time, stdout, stdout_length, exit_code
+    ))
+    
+    return f"({file_size} bytes) {exec_time:.3f}s"
+
+def run_speed_evaluation(config_path: Path, results_dir: Path,
+                         absolute_tokens: Optional[int] = None) -> bool:
+    """
+    Run speed evaluation for all models and configurations.
+    When absolute_tokens is set, every model is tested with the same file sizes
+    (size_factor * absolute_tokens) instead of its own max_tokens.
+    Returns False if any result could not be written to the results file.
+    """
     config = load_config(config_path)
     
     # Create results directory if it doesn't exist
@@ -110,70 +180,81 @@ def run_speed_evaluation(config_path: Path, results_dir: Path) -> None:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     result_file = results_dir / f"speed_{timestamp}.csv"
     
-    # Write CSV header
-    with open(result_file, 'w') as f:
-        f.write("model,config_file,size_factor,execution_time,summary_length,exit_code,summary\n")
-    
     models = config.get("models", {})
     size_factors = config.get("size_factors", [0.1, 0.2, 0.5, 1.0])
+    default_parallelism = config.get("parallelism", DEFAULT_PARALLELISM)
     configs_dir = Path(__file__).parent.parent / "configs"
     
+    available_configs = list_config_names(configs_dir)
+    
     print(f"Starting speed evaluation...")
     print(f"Results will be written to: {result_file}")
     print(f"Models: {list(models.keys())}")
     print(f"Size factors: {size_factors}")
+    if absolute_tokens is not None:
+        print(f"Absolute tokens: {absolute_tokens}")
     print()
     
-    for model_name, model_config in models.items():
-        max_tokens = model_config.get("max_tokens", 131072)
-        config_files = model_config.get("config_files", [])
-        
-        if not config_files:
-            print(f"Warning: No config files specified for model {model_name}, skipping.")
-            continue
-        
-        for config_file in config_files:
-            config_path_full = configs_dir / config_file
-            if not config_path_full.exists():
-                print(f"Warning: Config file {config_path_full} does not exist, skipping.")
+    report_force_summary_support()
+    
+    results_q, writer_thread, write_failures = start_result_writer(result_file, RESULT_HEADER)
+    try:
+        for model_name, model_config in models.items():
+            if absolute_tokens is not None:
+                max_tokens = absolute_tokens
+            else:
+                max_tokens = model_config.get("max_tokens", 131072)
+            config_files = model_config.get("config_files", [])
+            parallelism = model_config.get("parallelism", default_parallelism)
+            
+            if not config_files:
+                print(f"Warning: No config files specified for model {model_name}, skipping.")
                 continue
             
-            print(f"Evaluating {model_name} with config {config_file}...")
+            print(f"Evaluating {model_name} (parallelism {parallelism})...")
             
-            for size_factor in size_factors:
-                # Generate test file
-                test_file = write_test_file(max_tokens, size_factor)
-                file_size = os.path.getsize(test_file)
-                
+            # Test files only depend on size, so every config reuses the same ones
+            test_files = {
+                size_factor: get_test_file(int(size_factor * max_tokens))
+                for size_factor in size_factors
+            }
+            
+            # Models run one after another so they never compete for the provider
+            with ThreadPoolExecutor(max_workers=parallelism) as executor:
+                futures = {}
                 try:
-                    print(f"  Size factor {size_factor} ({file_size} bytes)...", end=" ", flush=True)
-                    
-                    # Run command
-                    exec_time, stdout, exit_code = run_command(
-                        str(config_path_full),
-                        f"cat {test_file}",
-                        cwd=repo_root,
-                        force_summary=True,
-                    )
+                    for config_file in config_files:
+                        config_path_full = configs_dir / config_file
+                        if not config_available(config_file, config_path_full, available_configs):
+                            print(f"Warning: Config file {config_path_full} does not exist, skipping.")
+                            continue
+                        
+                        for size_factor in size_factors:
+                            future = executor.submit(
+                                measure_size_factor, model_name, config_file,
+                                config_path_full, size_factor, test_files[size_factor],
+                                repo_root, results_q,
+                            )
+                            futures[future] = (config_file, size_factor)
                     
-                    print(f"{exec_time:.3f}s")
-                    
-                    # Write result
-                    write_result_file(
-                        result_file, model_name, config_file, size_factor,
-                        exec_time, stdout, exit_code
-                    )
-                    
-                except Exception as e:
-                    print(f"ERROR: {e}")
-                finally:
-                    # Clean up test file
-                    try:
-                        os.unlink(test_file)
-                    except:
-                        pass
+                    for future in as_completed(futures):
+                        config_file, size_factor = futures[future]
+                        try:
+                            message = future.result()
+                        except Exception as e:
+                            message = f"ERROR: {e}"
+                        print(f"  {config_file} / size factor {size_factor}: {message}")
+                except BaseException:
+                    cancel_pending(futures)
+                    raise
+    finally:
+        written = finish_result_writer(results_q, writer_thread, write_failures, result_file)
+    
+    if not written:
+        return False
     
     print(f"\nEvaluation complete. Results saved to: {result_file}")
+    return True
 
 def main():
     """Main entry point."""
@@ -185,10 +266,22 @@ def main():
     results_dir = evals_dir / "results"
     
     # Allow override via command line
-    if len(sys.argv) > 1:
-        config_path = Path(sys.argv[1])
-    if len(sys.argv) > 2:
-        results_dir = Path(sys.argv[2])
+    args = sys.argv[1:]
+    absolute_tokens = None
+    if "--absolute-tokens" in args:
+        index = args.index("--absolute-tokens")
+        try:
+            absolute_tokens = int(args[index + 1])
+        except (IndexError, ValueError):
+            absolute_tokens = None
+        if absolute_tokens is None or absolute_tokens <= 0:
+            print("Error: --absolute-tokens requires a token count")
+            sys.exit(1)
+        del args[index:index + 2]
+    if len(args) > 0:
+        config_path = Path(args[0])
+    if len(args) > 1:
+        results_dir = Path(args[1])
     
     if not config_path.exists():
         print(f"Error: Config file not found: {config_path}")
@@ -198,7 +291,8 @@ def main():
   "models": {
     "model-name": {
       "max_tokens": 131072,
-      "config_files": ["model-name.toml"]
+      "config_files": ["model-name.toml"],
+      "parallelism": 1
     }
   },
   "size_factors": [0.1, 0.2, 0.5, 1.0]
@@ -206,7 +300,8 @@ def main():
 """)
         sys.exit(1)
     
-    run_speed_evaluation(config_path, results_dir)
+    if not run_speed_evaluation(config_path, results_dir, absolute_tokens):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -6,7 +6,6 @@ It intentionally fails when the required input file is missing so that
 the evaluator can verify whether summaries surface the error clearly.
 """
 
-import json
 import sys
 from pathlib import Path
 
@@ -15,13 +14,18 @@ INPUT_PATH = Path("evals/quality/fixtures/data/input.json")
 
 
 def load_input() -> dict:
-    if not INPUT_PATH.exists():
+    try:
+        handle = INPUT_PATH.open("r", encoding="utf-8")
+    except FileNotFoundError:
         raise FileNotFoundError(
             f"Required input file is missing: {INPUT_PATH}. "
             "Add a small JSON file with a top-level 'records' list."
-        )
+        ) from None
+
+    # Deferred so the common missing-file failure doesn't pay for the import
+    import json
 
-    with INPUT_PATH.open("r", encoding="utf-8") as handle:
+    with handle:
         return json.load(handle)
 
 